@@ -37,5 +37,6 @@ def requirements(file):
 setup(
     setup_requires = ['wheel'],
     install_requires = requirements('requirements.txt'),
-    extras_require={'dev': requirements('requirements-dev.txt')},
+    extras_require={'dev': requirements('requirements-dev.txt'),
+                    'fast': requirements('requirements-fast.txt')},
 )
@@ -8,44 +8,68 @@ This code is open-source software released under the MIT license.
 Please see the file "LICENSE" for more information.
 '''
 
-import sys
-if sys.version_info <= (3, 8):
-    print('taupe requires Python version 3.8 or higher,')
-    print('but the current version is ' + str(sys.version_info.major)
-          + '.' + str(sys.version_info.minor) + '.')
-    exit(1)
-
 # Note: this code uses lazy loading.  Additional imports are made later.
-from   commonpy.data_structures import CaseFoldDict
 import errno
 import plac
 from   sidetrack import set_debug, log
+import sys
 
 from   .exit_codes import ExitCode
 
+# The JSON parsers are not needed for things like --help, so they are only
+# imported when parsing starts. They're set by load_json_parsers().
+json  = None
+ijson = None
+
 
 # Constants.
 # .............................................................................
 
-# Mapping of recognized --extract argument values to canonical names.
-EXTRACT_OPTIONS = CaseFoldDict({'all-tweets'     : 'all-tweets',
-                                'tweets'         : 'all-tweets',
-                                'my-tweets'      : 'my-tweets',
-                                'my-tweet'       : 'my-tweets',
-                                'my'             : 'my-tweets',
-                                'mine'           : 'my-tweets',
-                                'retweets'       : 'retweets',
-                                'retweet'        : 'retweets',
-                                'quoted-tweets'  : 'quote-tweets',
-                                'quote-tweets'   : 'quote-tweets',
-                                'quoted'         : 'quote-tweets',
-                                'replied-tweets' : 'reply-tweets',
-                                'reply-tweets'   : 'reply-tweets',
-                                'replied'        : 'reply-tweets',
-                                'reply'          : 'reply-tweets',
-                                'likes'          : 'likes',
-                                'liked'          : 'likes',
-                                'like'           : 'likes'})
+# Mapping of recognized --extract argument values to canonical names. The keys
+# must be in lower case; values given by the user are case-folded to match.
+EXTRACT_OPTIONS = {'all-tweets'     : 'all-tweets',
+                   'tweets'         : 'all-tweets',
+                   'my-tweets'      : 'my-tweets',
+                   'my-tweet'       : 'my-tweets',
+                   'my'             : 'my-tweets',
+                   'mine'           : 'my-tweets',
+                   'retweets'       : 'retweets',
+                   'retweet'        : 'retweets',
+                   'quoted-tweets'  : 'quote-tweets',
+                   'quote-tweets'   : 'quote-tweets',
+                   'quoted'         : 'quote-tweets',
+                   'replied-tweets' : 'reply-tweets',
+                   'reply-tweets'   : 'reply-tweets',
+                   'replied'        : 'reply-tweets',
+                   'reply'          : 'reply-tweets',
+                   'likes'          : 'likes',
+                   'liked'          : 'likes',
+                   'like'           : 'likes'}
+
+# Format of the "created_at" timestamps in tweets.js. Example value:
+# "Wed Oct 10 20:19:24 +0000 2018".
+TWEET_DATE_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+# Month numbers for the month abbreviations used in "created_at" timestamps.
+MONTHS = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+          'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
+
+# The .js files in an archive contain JSON data preceded by a JavaScript
+# assignment statement. These are the prefixes to skip in the files we read.
+ACCOUNT_PREFIX = b'window.YTD.account.part0 = '
+LIKES_PREFIX   = b'window.YTD.like.part0 = '
+TWEETS_PREFIX  = b'window.YTD.tweets.part0 = '
+
+# Prefix of the shortened links that Twitter puts in the text of tweets.
+TCO_PREFIX = 'https://t.co/'
+
+# Maximum size of an archive piped to stdin that is kept in memory. Bigger
+# archives are copied to a temporary file instead.
+STDIN_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# Number of rows of output joined together and written out at a time. With
+# typical row lengths, this amounts to somewhere around 0.5-1 MB of output.
+OUTPUT_BATCH_ROWS = 10_000
 
 # Main program.
 # .............................................................................
@@ -103,7 +127,7 @@ The following options are recognized:
 
 When using '--extract all-tweets' (the default), taupe produces a table with
 four columns.  Each row of the table corresponds to a tweet of some kind. The
-values in the columns provide details:
+values in the columns provide details, and the rows are sorted by date:
 
   Column 1    Column 2    Column 3        Column 4
   --------    --------    -------------   ---------------------------------
@@ -118,7 +142,9 @@ URLs of retweeted tweets. Note also that this format does NOT include your
 
 When using '--extract my-tweets', the output is just a single column (a list)
 of URLs, one per line, corresponding to just your original tweets. This list
-corresponds exactly to column 2 in the '--extract all-tweets' case above.
+has the same URLs as column 2 in the '--extract all-tweets' case above, but
+they are listed in the order they appear in the archive instead of sorted by
+date. (The same is true of the other lists described below.)
 
 When using '--extract retweets', the output is a single column (a list) of
 URLs, one per line, of tweets that are retweets of other tweets. This list
@@ -186,16 +212,15 @@ Command-line options summary
     if version:
         from taupe import print_version
         print_version()
-        sys.exit(int(ExitCode.success))
+        sys.exit(ExitCode.success)
 
     log('starting.')
     log('command line: ' + str(sys.argv))
 
     extract = 'all-tweets' if extract == 'E' else extract
-    if extract not in EXTRACT_OPTIONS:
+    requested = EXTRACT_OPTIONS.get(extract.casefold())
+    if requested is None:
         stop('Unrecognized value for --extract option: ' + extract, ExitCode.bad_arg)
-    else:
-        requested = EXTRACT_OPTIONS[extract]
 
     archive_file = '-' if not archive_file else archive_file[0]
     if archive_file == '-' and sys.stdin.isatty():
@@ -221,33 +246,52 @@ Command-line options summary
     exit_code = ExitCode.success
     try:
         if archive_file == '-':
-            log('reading archive from stdin')
-            import io
-            archive_file = io.BytesIO(sys.stdin.buffer.read())
+            # ZipFile needs to be able to seek in its input. That's possible
+            # when stdin is redirected from a file. Otherwise, keep a small
+            # archive in memory, but copy a large one to a temporary file.
+            # (SpooledTemporaryFile would do this too, but ZipFile can't use
+            # it before Python 3.11 because it lacks a seekable() method.)
+            if sys.stdin.buffer.seekable():
+                log('reading archive directly from stdin')
+                archive_file = sys.stdin.buffer
+            else:
+                head = sys.stdin.buffer.read(STDIN_MEMORY_LIMIT)
+                if len(head) < STDIN_MEMORY_LIMIT:
+                    log('keeping archive from stdin in memory')
+                    import io
+                    archive_file = io.BytesIO(head)
+                else:
+                    log('copying archive from stdin to a temporary file')
+                    from shutil import copyfileobj
+                    from tempfile import TemporaryFile
+                    archive_file = TemporaryFile()
+                    archive_file.write(head)
+                    del head
+                    copyfileobj(sys.stdin.buffer, archive_file)
+                    archive_file.seek(0)
 
         data = parsed_data(archive_file, requested, canonical_urls)
-        filtered_data = filter(None, map(data_filter(requested), data))
-        write_data(filtered_data, output)
+        write_data(output_rows(data, requested), output)
     except KeyboardInterrupt:
         # Catch it, but don't treat it as an error; just stop execution.
         log('keyboard interrupt received')
         exit_code = ExitCode.user_interrupt
     except Exception as ex:             # noqa: PIE786
         exit_code = ExitCode.exception
-        import traceback
-        exception = sys.exc_info()
-        details = ''.join(traceback.format_exception(*exception))
-        log('exception: ' + str(ex) + '\n\n' + details)
+        if debugging:
+            # Formatting the traceback is only worth it if it gets logged.
+            import traceback
+            details = ''.join(traceback.format_exception(*sys.exc_info()))
+            log('exception: ' + str(ex) + '\n\n' + details)
         if debugging and debug == '-':
             from rich.console import Console
             Console().print_exception()
         else:
             import taupe
-            line = 'unknown'
             tb = ex.__traceback__
             while tb.tb_next:
                 tb = tb.tb_next
-                line = tb.tb_lineno
+            line = tb.tb_lineno
             stop('Oh no! Taupe encountered an error. Please consider reporting'
                  f' this to the developer. Your version of {taupe.__name__} is'
                  f' {taupe.__version__} and the error occurred on line {line}.'
@@ -256,8 +300,8 @@ Command-line options summary
 
     # Exit with status code ---------------------------------------------------
 
-    log(f'exiting with exit code {int(exit_code)}.')
-    sys.exit(int(exit_code))
+    log(f'exiting with exit code {exit_code}.')
+    sys.exit(exit_code)
 
 
 # Miscellaneous helpers.
@@ -278,81 +322,132 @@ Command-line options summary
 #
 # This kind of funneling of all types into a common intermediate form, even
 # though there is heterogeneity in the underlying data, is done to shorten
-# and simplify the code and not really for performance reasons. Performance
-# is currently not a concern because the expectation is that users won't run
-# this program very often anyway.
-
-def data_filter(requested):
-    return {
-        'all-tweets'  : lambda row: ','.join(row),
-        'my-tweets'   : lambda row: row[1],
-        'retweets'    : lambda row: row[1] if row[2] == 'retweet' else '',
-        'quote-tweets': lambda row: row[3] if row[2] == 'quote' else '',
-        'reply-tweets': lambda row: row[3] if row[2] == 'reply' else '',
-        'likes'       : lambda row: row[3],
-    }.get(requested)
+# and simplify the code. Personal archives can be large (hundreds of MB of
+# tweets), so the parsing functions try to avoid holding more of the data in
+# memory than necessary and to keep the per-tweet work small.
+
+def output_rows(data, requested):
+    '''Return a generator of the lines of output for the requested data.'''
+    # Each case picks out only what it needs, and rows that don't belong in
+    # the output are skipped here instead of being filtered out afterwards.
+    if requested == 'all-tweets':
+        return (f'{date},{url},{kind},{ref}' for (date, url, kind, ref) in data)
+    elif requested == 'my-tweets':
+        return (row[1] for row in data)
+    elif requested == 'retweets':
+        return (row[1] for row in data if row[2] == 'retweet')
+    elif requested == 'quote-tweets':
+        return (row[3] for row in data if row[2] == 'quote')
+    elif requested == 'reply-tweets':
+        return (row[3] for row in data if row[2] == 'reply')
+    else:
+        return (row[3] for row in data)
 
 
 def likes_from(likes_file, username, canonical_urls = False):
-    '''Return the URLs from the likes.js file in a Twitter archive.'''
-    import json
-    # The file starts with "window.YTD.like.part0 = ". Skip that and it's json.
-    likes_json = json.loads(likes_file[23:])
-    log(f'extracted {len(likes_json)} likes from the likes file')
+    '''Yield the URLs from the likes.js file object.'''
+    skip_prefix(likes_file, LIKES_PREFIX)
+    if ijson:
+        # Stream the likes, so that they're never all in memory at once.
+        likes_json = ijson.items(likes_file, 'item')
+    else:
+        likes_json = json.loads(likes_file.read())
+    # Both parsers yield the same items, so a like without the expected keys
+    # is an error no matter which parser is in use.
     likes_urls = (item['like']['expandedUrl'] for item in likes_json)
+    # The URLs have the form https://twitter.com/i/web/status/TWEETID.
+    # Replace only the "i/web" part, not any other occurrence in the URL.
+    web_prefix = 'https://twitter.com/i/web/'
+    web_prefix_len = len(web_prefix)
     account = 'twitter' if canonical_urls else username
-    # Return the same 4-tuple format as tweets_from(...).
-    return (('', '', 'like', url.replace('i/web', account)) for url in likes_urls)
+    account_prefix = f'https://twitter.com/{account}/'
+    count = 0
+    for count, url in enumerate(likes_urls, 1):
+        if url.startswith(web_prefix):
+            url = account_prefix + url[web_prefix_len:]
+        # Yield the same 4-tuple format as tweets_from(...).
+        yield ('', '', 'like', url)
+    log(f'extracted {count} likes from the likes file')
+
+
+def tweets_from(tweets_file, username, canonical_urls = False,
+                requested = 'all-tweets'):
+    '''Return tuples of parsed data from the tweets.js file object.'''
+    from operator import itemgetter
+
+    skip_prefix(tweets_file, TWEETS_PREFIX)
+    if ijson:
+        # Stream the tweets, so that only one tweet is in memory at a time.
+        items = ijson.items(tweets_file, 'item', use_float = True)
+    else:
+        items = json.loads(tweets_file.read())
+    all_tweets = (item['tweet'] for item in items)
 
+    rows = tweet_rows(all_tweets, username, canonical_urls, requested)
 
-def tweets_from(tweets_file, username, canonical_urls = False):
-    '''Return tuples of parsed data from tweets.js in a Twitter archive.'''
-    from dateutil.parser import parse
-    import json
-    import re
+    if requested != 'all-tweets':
+        # Only the table of all tweets is meant to be in chronological order.
+        # Other kinds of output can be streamed in the order of the archive.
+        return rows
 
-    ending_in_twitter_url = re.compile(r'.*(https://t.co/\S+)$')
+    # Sort on the numeric timestamp alone instead of comparing whole tuples
+    # or date strings, then drop the timestamp to return the usual 4-tuples.
+    rows = list(rows)
+    rows.sort(key = itemgetter(0))
+    log(f'found a total of {len(rows)} tweets in the tweets file')
+    return (row[1:] for row in rows)
 
-    # Helper functions.
 
-    def user_from_tweet_url(url):
-        if canonical_urls:
-            return 'twitter'
-        else:
-            # Extract USERNAME from https://twitter.com/USERNAME/status/TWEETID
-            fragment = url[20:]
-            return fragment[: fragment.find('/')]
+def tweet_rows(tweets, username, canonical_urls = False, requested = 'all-tweets'):
+    '''Return an iterator of row tuples for the given tweet objects.'''
+    from datetime import datetime, timezone
 
-    def tweet_url(tweet):
-        account = 'twitter' if canonical_urls else username
-        return 'https://twitter.com/' + account + '/status/' + tweet['id_str']
+    strptime = datetime.strptime
+    utc = timezone.utc
 
-    def tweet_date(tweet):
-        date = parse(tweet['created_at'])
-        return date.isoformat()
+    # Precompute the URL prefixes so they're not rebuilt for every tweet.
+    twitter_prefix = 'https://twitter.com/twitter/status/'
+    self_prefix = (twitter_prefix if canonical_urls
+                   else f'https://twitter.com/{username}/status/')
+
+    # Helper functions.
 
-    def tweet_data(tweet):
-        tdate = tweet_date(tweet)
-        turl  = tweet_url(tweet)
+    def user_from_tweet_url(url):
+        # Extract USERNAME from https://twitter.com/USERNAME/status/TWEETID
+        fragment = url[20:]
+        return fragment[: fragment.find('/')]
 
+    def tweet_date(tweet):
+        # The format is fixed and the times are in UTC, so picking the fields
+        # out by position is much faster than strptime. In case the offset
+        # is ever something other than +0000, fall back to strptime.
+        text = tweet['created_at']
+        if text[20:25] != '+0000':
+            return strptime(text, TWEET_DATE_FORMAT)
+        return datetime(int(text[26:30]), MONTHS[text[4:7]], int(text[8:10]),
+                        int(text[11:13]), int(text[14:16]), int(text[17:19]),
+                        tzinfo = utc)
+
+    def tweet_type(tweet):
         # Figure out the type & extracting reference URLs. Look for specific
         # cases; default case is normal tweet, possibly with embedded media.
         ttype = 'tweet'
         tref  = ''
-        if tweet.get('in_reply_to_status_id_str', None):
+        # Get the values used in more than one place below just once.
+        full_text = tweet['full_text']
+        reply_id = tweet.get('in_reply_to_status_id_str')
+        if reply_id:
             # Easiest case: replies.
             ttype = 'reply'
             if canonical_urls:
-                author = 'twitter'
-            elif 'in_reply_to_screen_name' not in tweet:
+                tref = twitter_prefix + reply_id
+            elif (author := tweet.get('in_reply_to_screen_name')) is None:
                 # This happens if the tweet being replied to has been deleted.
                 log(f'reply tweet {tweet["id"]} refers to a deleted tweet')
-                author = 'twitter'
+                tref = twitter_prefix + reply_id
             else:
-                author = tweet['in_reply_to_screen_name']
-            tweet_id = tweet['in_reply_to_status_id_str']
-            tref = 'https://twitter.com/' + author + '/status/' + tweet_id
-        elif tweet['full_text'].startswith('RT @'):
+                tref = f'https://twitter.com/{author}/status/{reply_id}'
+        elif full_text.startswith('RT @'):
             ttype = 'retweet'
             # In my archive, the full_text of retweeted tweets is truncated,
             # and the tweet object doesn't contain the retweeted tweet's id
@@ -360,84 +455,178 @@ def tweets_from(tweets_file, username, canonical_urls = False):
             # Twitter, it shows info about the original tweet.) The archive is
             # thus incomplete and I see no way to get the retweeted tweet's id.
             tref = ''
-        elif (match := ending_in_twitter_url.match(tweet['full_text'])):
+        elif (embedded_url := tco_url_at_end(full_text)) is not None:
             # This can be either a quote tweet or just a tweet with media in it.
-            embedded_url = match.group(1)
-            for entity in tweet['entities']['urls']:
-                if entity['url'] != embedded_url:
-                    continue
-                # Found the entity info for the URL we pulled from the text.
-                expanded_url = entity['expanded_url']
-                if not expanded_url.startswith('https://twitter.com'):
-                    # This is not a quote tweet after all.
-                    break
-                author = user_from_tweet_url(expanded_url)
-                tweet_id = expanded_url[expanded_url.rfind('/') + 1:]
-                tref = 'https://twitter.com/' + author + '/status/' + tweet_id
+            # Find the entity info for the URL we pulled from the text.
+            urls = tweet.get('entities', {}).get('urls', ())
+            expanded = {e['url']: e['expanded_url'] for e in urls}
+            expanded_url = expanded.get(embedded_url, '')
+            # If it doesn't point to a tweet, this is not a quote tweet after all.
+            if expanded_url.startswith('https://twitter.com'):
+                tweet_id = expanded_url.rsplit('/', 1)[1]
+                if canonical_urls:
+                    tref = twitter_prefix + tweet_id
+                else:
+                    author = user_from_tweet_url(expanded_url)
+                    tref = f'https://twitter.com/{author}/status/{tweet_id}'
                 ttype = 'quote'
-                break
+        return (ttype, tref)
 
-        return (tdate, turl, ttype, tref)
+    # Functions that produce the rows. Parsing dates and figuring out the type
+    # of tweet is only done if the requested output needs them; otherwise,
+    # those fields are left empty. Dated rows have an extra timestamp in front
+    # that tweets_from() uses for sorting and then removes. The other rows are
+    # not sorted, so they're produced in their final form right away.
 
-    # The 26 is to skip the "window.YTD.tweets.part0 =" text at the start.
-    all_tweets = json.loads(tweets_file[26:])
-    log(f'found a total of {len(all_tweets)} tweets in the tweets file')
-    return sorted(tweet_data(tweet_json['tweet']) for tweet_json in all_tweets)
+    def dated_row(tweet):
+        date = tweet_date(tweet)
+        return (date.timestamp(), date.isoformat(), self_prefix + tweet['id_str'],
+                *tweet_type(tweet))
+
+    def typed_row(tweet):
+        return ('', self_prefix + tweet['id_str'], *tweet_type(tweet))
+
+    def url_row(tweet):
+        return ('', self_prefix + tweet['id_str'], '', '')
+
+    if requested == 'all-tweets':
+        return map(dated_row, tweets)
+    elif requested == 'my-tweets':
+        return map(url_row, tweets)
+    else:
+        return map(typed_row, tweets)
+
+
+def tco_url_at_end(text):
+    '''Return the t.co URL at the very end of text, or None if there isn't one.'''
+    # This is a lot cheaper than matching a regex that has to scan the text.
+    # A single newline at the very end is allowed, the way regex '$' does.
+    if text.endswith('\n'):
+        text = text[:-1]
+    start = text.rfind(TCO_PREFIX)
+    if start < 0:
+        return None
+    url = text[start:]
+    # The URL has to be the last thing in the text, with nothing following it.
+    return url if len(url) > len(TCO_PREFIX) and url.split() == [url] else None
 
 
 def username_from(account_file):
-    '''Return the "username" from the account.js file in a Twitter archive.'''
-    import json
-    # The file starts w/ "window.YTD.account.part0 = ". Skip it; rest is json.
-    account_json = json.loads(account_file[27:])
+    '''Return the "username" from the account.js file object.'''
+    skip_prefix(account_file, ACCOUNT_PREFIX)
+    account_json = json.loads(account_file.read())
     username = account_json[0]['account']['username']
     log(f'found username "{username}"')
     return username
 
 
+def skip_prefix(js_file, prefix):
+    '''Read past the JavaScript prefix at the start of the given file object.'''
+    if js_file.read(len(prefix)) != prefix:
+        stop(f'Unexpected content at the start of {js_file.name}.', ExitCode.file_error)
+
+
+def load_json_parsers():
+    '''Import the JSON parsers, if that hasn't been done yet.'''
+    global json, ijson
+    if json:
+        return
+
+    # orjson is much faster than the stdlib json module at decoding the large
+    # .js files in an archive, but it's optional; fall back to json if needed.
+    try:
+        import orjson as json
+    except ImportError:
+        import json
+
+    # ijson lets us parse tweets.js incrementally instead of loading it all
+    # into memory at once. Only its C backend is fast enough to compete with
+    # decoding the whole file using orjson, so other backends are not used.
+    try:
+        import ijson
+        ijson = ijson.get_backend('yajl2_c')
+    except ImportError:
+        ijson = None
+
+
 def parsed_data(source_zip, requested, canonical_urls):
-    from zipfile import is_zipfile, ZipFile, BadZipFile, LargeZipFile
-    if not is_zipfile(source_zip):
-        stop('The input does not appear to be a ZIP file.', ExitCode.bad_arg)
+    from zipfile import ZipFile, BadZipFile, LargeZipFile
+    load_json_parsers()
     log(f'parsing Twitter data to extract {requested}')
+    # ZipFile() does the same check as is_zipfile(), so don't do it twice.
     try:
-        username = None
-        with ZipFile(source_zip) as zf:
-            # First find the account name because we need it to construct URLs.
-            for item in zf.namelist():
-                if item == 'data/account.js':
-                    with zf.open(item) as file_:
-                        username = username_from(file_.read())
-                    break
-            if not username:
-                stop('Cannot find account.js file in ' + source_zip, ExitCode.file_error)
-
-            # Now extract the tweets.
-            for item in zf.namelist():
-                if item == 'data/like.js' and requested == 'likes':
-                    with zf.open(item) as file_:
-                        return likes_from(file_.read(), username, canonical_urls)
-                    break
-                elif item == 'data/tweets.js':
-                    with zf.open(item) as file_:
-                        return tweets_from(file_.read(), username, canonical_urls)
-                    break
-        log('done parsing Twitter data')
+        zf = ZipFile(source_zip)
+    except BadZipFile:
+        stop('The input does not appear to be a ZIP file.', ExitCode.bad_arg)
+    try:
+        # Look up entries by name. ZipFile keeps a dict of them, so this
+        # avoids scanning the list of (possibly thousands of) entries.
+        # First find the account name because we need it to construct URLs.
+        try:
+            account_info = zf.getinfo('data/account.js')
+        except KeyError:
+            stop('Cannot find account.js file in the archive.', ExitCode.file_error)
+        with zf.open(account_info) as file_:
+            username = username_from(file_)
+
+        # Now find the file with the tweets.
+        name = 'like.js' if requested == 'likes' else 'tweets.js'
+        try:
+            info = zf.getinfo('data/' + name)
+        except KeyError:
+            stop(f'Cannot find {name} file in the archive.', ExitCode.file_error)
     except BadZipFile:
         stop('Unable to parse ZIP archive.', ExitCode.file_error)
     except LargeZipFile:
         stop('Unable to parse very large ZIP archive.', ExitCode.file_error)
 
+    # The ZIP file has to stay open until the caller has consumed the data,
+    # so that the extractors can stream their results straight out of it.
+    def data():
+        try:
+            with zf, zf.open(info) as file_:
+                if requested == 'likes':
+                    yield from likes_from(file_, username, canonical_urls)
+                else:
+                    yield from tweets_from(file_, username, canonical_urls,
+                                           requested)
+            log('done parsing Twitter data')
+        except BadZipFile:
+            stop('Unable to parse ZIP archive.', ExitCode.file_error)
+
+    return data()
+
 
 def write_data(rows, dest):
     log(f'writing output to {dest}')
+
+    # Write rows as they come rather than joining them all first, so that the
+    # rows never have to be in memory all at the same time. They're joined,
+    # encoded and written in large batches to avoid paying the overhead of a
+    # write call (and of the text I/O layer) on every line. Taking batches
+    # with islice keeps the per-row work out of Python code altogether.
+    from itertools import islice
+    remaining = iter(rows)
+
+    def write_rows(out, batch):
+        while batch:
+            batch.append('')            # So that the output ends with '\n'.
+            out.write('\n'.join(batch).encode('utf-8'))
+            batch = list(islice(remaining, OUTPUT_BATCH_ROWS))
+        out.flush()
+
+    # The rows are produced lazily, so problems with the archive's content
+    # (e.g., malformed JSON) only show up once rows are requested. Get the
+    # first batch before opening the destination, so that an existing file
+    # isn't truncated if the archive can't be read.
+    first_batch = list(islice(remaining, OUTPUT_BATCH_ROWS))
     try:
         if dest == '-':
-            print(*rows, flush = True, sep = '\n')
             sys.stdout.flush()
+            write_rows(sys.stdout.buffer, first_batch)
         else:
-            with open(dest, 'w') as output:
-                output.write('\n'.join(rows))
+            with open(dest, 'wb') as output:
+                write_rows(output, first_batch)
     except IOError as ex:
         # Check for broken pipe, as happens when the output is sent to "head".
         if ex.errno == errno.EPIPE:
@@ -457,10 +646,13 @@ def write_data(rows, dest):
 def stop(msg, err = ExitCode.exception):
     '''Print an error message and exit with an exit code.'''
     log('printing to terminal: ' + msg)
-    from rich import print
-    print('[red]' + msg + '[/]')
-    log(f'exiting with exit code {int(err)}.')
-    sys.exit(int(err))
+    # Importing rich just to color one line of text slows down startup, so
+    # use a plain ANSI escape sequence instead.
+    if sys.stderr.isatty():
+        msg = '\x1b[31m' + msg + '\x1b[0m'
+    sys.stderr.write(msg + '\n')
+    log(f'exiting with exit code {err}.')
+    sys.exit(err)
 
 
 # Main entry point.
@@ -8,29 +8,30 @@ This code is open-source software released under the MIT license.
 Please see the file "LICENSE" for more information.
 '''
 
-from aenum import Enum, MultiValue
+from enum import IntEnum
 
 
-# I adapted the clever approach posted by the author of the Python aenum
-# package, Ethan Furman, to Stack Overflow on 2016-03-13 at
-# https://stackoverflow.com/a/35964875/743730
-# The most important bit is realizing you can define __int__().
+# The stdlib IntEnum makes the members ints, so there's no need for the aenum
+# package and a custom __int__(). The __new__() method below is the approach
+# described in the Python enum documentation for attaching extra attributes
+# (here, a description of the meaning of each code) to enum members.
 
-class ExitCode(Enum):
+class ExitCode(IntEnum):
     '''Class of exit codes that this program may return.
 
-    The numeric value of a given code can be obtained by using int().  For
-    example, int(ExitCode.success) will produce 0.
+    Members are ints, so the numeric value of a given code can be obtained
+    with int() or used as-is.  For example, int(ExitCode.success) will
+    produce 0.  The attribute "meaning" holds a short description.
     '''
 
-    _init_ = 'value meaning'
-    _settings_ = MultiValue
+    def __new__(cls, value, meaning):
+        obj = int.__new__(cls, value)
+        obj._value_ = value
+        obj.meaning = meaning
+        return obj
 
     success        = 0, "success -- program completed normally"
     user_interrupt = 1, "the user interrupted the program's execution"
     bad_arg        = 2, "encountered a bad or missing value for an option"
     file_error     = 3, "encountered a problem with a file or directory"
     exception      = 4, "a miscellaneous exception or fatal error occurred"
-
-    def __int__(self):
-        return self.value